@@ -3,12 +3,20 @@ Smart Confidant - A Magic: The Gathering chatbot that uses HuggingFace API model
 """
 
 import gradio as gr
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient
 import os
-import base64
+import sys
+import asyncio
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from datetime import datetime
-from threading import Lock
+from collections import deque
+from functools import lru_cache
+from starlette.datastructures import MutableHeaders
+from starlette.middleware import Middleware
 
 # Load environment variables from .env file
 try:
@@ -25,21 +33,44 @@ API_MODELS = ["meta-llama/Llama-3.2-3B-Instruct"]
 DEFAULT_SYSTEM_MESSAGE = "You are an expert assistant for Magic: The Gathering. You're name is Smart Confidant, but people tend to call you Bob."
 TITLE = "🎓🧙🏻‍♂️ Smart Confidant 🧙🏻‍♂️🎓"
 MODEL_OPTIONS = list(API_MODELS)
+HF_TOKEN = os.environ.get("HF_TOKEN")
 
-# Debug logging
-debug_logs = []
-debug_lock = Lock()
-MAX_LOG_LINES = 100
+# Request queue: API calls are awaited on the event loop, so many can run at once
+QUEUE_CONCURRENCY_LIMIT = 32
+QUEUE_MAX_SIZE = 64
 
-def log_debug(message, level="INFO"):
-    """Add timestamped message to debug log."""
-    timestamp = datetime.now().strftime("%H:%M:%S")
+# Debug logging (INFO chatter is only recorded when SC_DEBUG=1)
+DEBUG = os.environ.get("SC_DEBUG", "0") == "1"
+MAX_LOG_LINES = 100
+debug_logs = deque(maxlen=MAX_LOG_LINES)
+
+# Stdout writes happen on a QueueListener thread so logging never blocks a response
+_LOG_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+_log_queue = queue.SimpleQueue()
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+_log_listener = QueueListener(_log_queue, _stdout_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logger = logging.getLogger("smart_confidant")
+logger.setLevel(logging.DEBUG)
+logger.addHandler(QueueHandler(_log_queue))
+logger.propagate = False
+
+def log_debug(message, *args, level="INFO", exc_info=False):
+    """Add timestamped message to debug log, %-formatting args only if it is recorded.
+
+    With exc_info=True the active traceback is written to stdout in debug mode only.
+    """
+    if level == "INFO" and not DEBUG:
+        return
+    if args:
+        message = message % args
+    timestamp = time.strftime("%H:%M:%S")
     log_entry = f"[{timestamp}] [{level}] {message}"
-    with debug_lock:
-        debug_logs.append(log_entry)
-        if len(debug_logs) > MAX_LOG_LINES:
-            debug_logs.pop(0)
-    print(log_entry)
+    debug_logs.append(log_entry)  # deque.append is atomic and evicts the oldest entry
+    logger.log(_LOG_LEVELS.get(level, logging.INFO), log_entry, exc_info=exc_info and DEBUG)
 
 # ============================================================================
 # Assets
@@ -48,20 +79,34 @@ def log_debug(message, level="INFO"):
 ASSETS_DIR = Path(__file__).parent / "assets"
 ASSETS_DIR_ABSOLUTE = str(ASSETS_DIR)
 
-# Load background image as base64 for CSS
+# Background image is served by Gradio's file route so browsers can cache it
 BACKGROUND_IMAGE_PATH = ASSETS_DIR / "confidant_pattern.png"
-try:
-    with open(BACKGROUND_IMAGE_PATH, "rb") as f:
-        BACKGROUND_DATA_URL = f"data:image/png;base64,{base64.b64encode(f.read()).decode('ascii')}"
-    log_debug("Background image loaded successfully")
-except Exception as e:
-    log_debug(f"Error loading background image: {e}", "ERROR")
-    BACKGROUND_DATA_URL = ""
+ASSETS_URL_PREFIX = f"/gradio_api/file={ASSETS_DIR.as_posix()}/"
+BACKGROUND_URL = ASSETS_URL_PREFIX + BACKGROUND_IMAGE_PATH.name
+ASSETS_CACHE_CONTROL = "public, max-age=31536000"
+
+class AssetsCacheMiddleware:
+    """ASGI middleware that marks files served from assets/ as long-lived cacheable."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(ASSETS_URL_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                MutableHeaders(scope=message)["Cache-Control"] = ASSETS_CACHE_CONTROL
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
 
 # CSS for tiled background and centered title
 CUSTOM_CSS = f"""
 body, .gradio-container, .main, .contain {{
-    background-image: url('{BACKGROUND_DATA_URL}') !important;
+    background-image: url('{BACKGROUND_URL}') !important;
     background-repeat: repeat !important;
     background-attachment: fixed !important;
     background-color: transparent !important;
@@ -78,29 +123,50 @@ h1 {{
 # Chat Response Handler
 # ============================================================================
 
-def respond(message, history: list[dict], system_message, max_tokens, temperature, top_p, selected_model):
-    """Handle chat responses via HuggingFace API."""
-    log_debug(f"Message: '{message[:50]}...' | Model: {selected_model}")
+@lru_cache(maxsize=8)
+def _system_message(content):
+    """Return a shared system-message dict for the given prompt text."""
+    return {"role": "system", "content": content}
+
+async def respond(message, history: list[dict], system_message, max_tokens, temperature, top_p, selected_model):
+    """Stream chat responses from the HuggingFace API."""
+    log_debug("Message: '%.50s...' | Model: %s", message, selected_model)
 
-    messages = [{"role": "system", "content": system_message}]
-    messages.extend(history)
-    messages.append({"role": "user", "content": message})
+    messages = [_system_message(system_message), *history, {"role": "user", "content": message}]
 
+    response = ""
     try:
-        hf_token = os.environ.get("HF_TOKEN")
-        client = InferenceClient(api_key=hf_token)
-        completion = client.chat.completions.create(
-            model=selected_model,
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=top_p,
+        # The client holds each streamed response open until it is closed, so scope it to this
+        # request: finishing, erroring or being cancelled (Stop / disconnect) closes the stream
+        # and tells the provider to stop generating.
+        async with AsyncInferenceClient(api_key=HF_TOKEN) as client:
+            n_chunks = 0
+            start = time.perf_counter()
+            stream = await client.chat.completions.create(
+                model=selected_model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    n_chunks += 1
+                    response += delta
+                    # Yield the full text: Gradio diffs successive yields and only sends the appended part
+                    yield response
+        elapsed = time.perf_counter() - start
+        log_debug(
+            "Streamed %d chunks, %d chars in %.2fs (%.0f c/s)",
+            n_chunks, len(response), elapsed, len(response) / elapsed if elapsed else 0.0,
         )
-        response = completion.choices[0].message.content
-        log_debug(f"Response received ({len(response)} chars)")
-        yield response
+    except asyncio.CancelledError:
+        log_debug("Generation cancelled after %d chars", len(response))
+        raise
     except Exception as e:
-        log_debug(f"Error: {e}", "ERROR")
+        log_debug("Error: %s", e, level="ERROR", exc_info=True)
         yield f"Error: {str(e)}"
 
 # ============================================================================
@@ -136,14 +202,16 @@ with gr.Blocks() as demo:
 if __name__ == "__main__":
     log_debug("=" * 40)
     log_debug("Smart Confidant Starting")
-    log_debug(f"HF_TOKEN: {'Yes' if os.environ.get('HF_TOKEN') else 'No'}")
+    log_debug("HF_TOKEN: %s", "Yes" if HF_TOKEN else "No")
     log_debug("=" * 40)
 
     port = int(os.environ.get("PORT", 8080))
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
     demo.launch(
         server_name="0.0.0.0",
         server_port=port,
         allowed_paths=[ASSETS_DIR_ABSOLUTE],
+        app_kwargs={"middleware": [Middleware(AssetsCacheMiddleware)]},
         css=CUSTOM_CSS,
         theme=gr.themes.Soft(primary_hue="green"),
     )
@@ -4,8 +4,11 @@ Builds, pushes, and deploys the application to GCP Cloud Run, Azure Container Ap
 """
 
 import subprocess
+import shlex
+import shutil
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # ============================================================================
 # Configuration
@@ -27,14 +30,22 @@ REGION_GCP = "us-central1"
 REGION_AZURE = "eastus"
 REGION_AWS = "us-east-1"
 
+# Cloud CLIs probed in the background on startup
+CLOUD_CLIS = ["gcloud", "az", "aws"]
+
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
-def run_cmd(cmd, check=True):
-    """Run a shell command and return success status."""
-    print(f"  Running: {cmd}")
-    result = subprocess.run(cmd, shell=True)
+def run_cmd(cmd, check=True, env=None):
+    """Run a command (argv list, no shell) and return success status."""
+    print(f"  Running: {shlex.join(cmd)}")
+    # Resolve the executable up front so .cmd wrappers (gcloud, az) work on Windows without a shell
+    executable = shutil.which(cmd[0])
+    if executable is None:
+        print(f"  Command not found: {cmd[0]}")
+        return False
+    result = subprocess.run([executable, *cmd[1:]], env=env)
     if check and result.returncode != 0:
         print(f"  Command failed with exit code {result.returncode}")
         return False
@@ -42,28 +53,38 @@ def run_cmd(cmd, check=True):
 
 def check_tool(tool_name):
     """Check if a CLI tool is installed."""
+    executable = shutil.which(tool_name)
+    if executable is None:
+        return False
     result = subprocess.run(
-        f"{tool_name} --version",
-        shell=True,
+        [executable, "--version"],
         capture_output=True,
         text=True
     )
     return result.returncode == 0
 
+def start_tool_checks(tool_names):
+    """Probe several CLI tools concurrently; returns {tool_name: Future[bool]}."""
+    executor = ThreadPoolExecutor(max_workers=len(tool_names))
+    futures = {name: executor.submit(check_tool, name) for name in tool_names}
+    executor.shutdown(wait=False)
+    return futures
+
 # ============================================================================
 # Build & Push
 # ============================================================================
 
 def build_image():
-    """Build Docker image locally."""
+    """Build Docker image locally (BuildKit is required for the Dockerfile's cache mounts)."""
     print("\n[1/2] Building Docker image...")
-    return run_cmd(f"docker build -t {FULL_IMAGE_NAME} .")
+    env = {**os.environ, "DOCKER_BUILDKIT": "1"}
+    return run_cmd(["docker", "build", "-t", FULL_IMAGE_NAME, "."], env=env)
 
 def push_image():
     """Push Docker image to Docker Hub."""
     print("\n[2/2] Pushing to Docker Hub...")
     print(f"  Image: {FULL_IMAGE_NAME}")
-    return run_cmd(f"docker push {FULL_IMAGE_NAME}")
+    return run_cmd(["docker", "push", FULL_IMAGE_NAME])
 
 
 def run_local():
@@ -89,47 +110,47 @@ def run_local():
 # Cloud Deployments
 # ============================================================================
 
-def deploy_gcp():
+def deploy_gcp(installed=None):
     """Deploy to Google Cloud Run."""
     print("\n--- Deploying to GCP Cloud Run ---")
-    if not check_tool("gcloud"):
+    if not (check_tool("gcloud") if installed is None else installed):
         print("  Error: gcloud CLI not installed.")
         print("  Install: https://cloud.google.com/sdk/docs/install")
         return False
 
-    cmd = (
-        f"gcloud run deploy {SERVICE_NAME} "
-        f"--image docker.io/{FULL_IMAGE_NAME} "
-        f"--region {REGION_GCP} "
-        f"--platform managed "
-        f"--allow-unauthenticated "
-        f"--port 8080"
-    )
+    cmd = [
+        "gcloud", "run", "deploy", SERVICE_NAME,
+        "--image", f"docker.io/{FULL_IMAGE_NAME}",
+        "--region", REGION_GCP,
+        "--platform", "managed",
+        "--allow-unauthenticated",
+        "--port", "8080",
+    ]
     return run_cmd(cmd)
 
-def deploy_azure():
+def deploy_azure(installed=None):
     """Deploy to Azure Container Apps."""
     print("\n--- Deploying to Azure Container Apps ---")
-    if not check_tool("az"):
+    if not (check_tool("az") if installed is None else installed):
         print("  Error: Azure CLI (az) not installed.")
         print("  Install: https://docs.microsoft.com/en-us/cli/azure/install-azure-cli")
         return False
 
     # az containerapp up is the simplest one-liner for deployment
-    cmd = (
-        f"az containerapp up "
-        f"--name {SERVICE_NAME} "
-        f"--image docker.io/{FULL_IMAGE_NAME} "
-        f"--ingress external "
-        f"--target-port 8080 "
-        f"--location {REGION_AZURE}"
-    )
+    cmd = [
+        "az", "containerapp", "up",
+        "--name", SERVICE_NAME,
+        "--image", f"docker.io/{FULL_IMAGE_NAME}",
+        "--ingress", "external",
+        "--target-port", "8080",
+        "--location", REGION_AZURE,
+    ]
     return run_cmd(cmd)
 
-def deploy_aws():
+def deploy_aws(installed=None):
     """Deploy to AWS App Runner."""
     print("\n--- Deploying to AWS App Runner ---")
-    if not check_tool("aws"):
+    if not (check_tool("aws") if installed is None else installed):
         print("  Error: AWS CLI not installed.")
         print("  Install: https://docs.aws.amazon.com/cli/latest/userguide/getting-started-install.html")
         return False
@@ -151,11 +172,17 @@ def main():
     print("Smart Confidant - Cloud Deployment")
     print("=" * 50)
 
+    # Probed CLI availability; deploy_* check synchronously for tools not listed here
+    installed = {}
+
     # Use pre-selected choice or prompt interactively
     if DEFAULT_CHOICE is not None:
         choice = str(DEFAULT_CHOICE)
         print(f"\nUsing DEFAULT_CHOICE={DEFAULT_CHOICE}")
     else:
+        # CLI startup is slow, so check the cloud CLIs while the image builds
+        tool_checks = start_tool_checks(CLOUD_CLIS)
+
         # Step 1: Build
         if not build_image():
             print("\nBuild failed. Exiting.")
@@ -169,9 +196,11 @@ def main():
         print("\n" + "=" * 50)
         print("Image ready. Select deployment target:")
         print("=" * 50)
-        print("  1. GCP Cloud Run")
-        print("  2. Azure Container Apps")
-        print("  3. AWS App Runner (manual)")
+        installed = {name: check.result() for name, check in tool_checks.items()}
+        missing = {name: "" if ok else f" [{name} not installed]" for name, ok in installed.items()}
+        print(f"  1. GCP Cloud Run{missing['gcloud']}")
+        print(f"  2. Azure Container Apps{missing['az']}")
+        print(f"  3. AWS App Runner (manual){missing['aws']}")
         print("  4. Skip deployment (image pushed to Docker Hub)")
         print("  5. Run locally (python app.py)")
         print()
@@ -179,11 +208,11 @@ def main():
         choice = input("Enter choice [1-5]: ").strip()
 
     if choice == "1":
-        deploy_gcp()
+        deploy_gcp(installed.get("gcloud"))
     elif choice == "2":
-        deploy_azure()
+        deploy_azure(installed.get("az"))
     elif choice == "3":
-        deploy_aws()
+        deploy_aws(installed.get("aws"))
     elif choice == "4":
         print("\nDone. Image available at:")
         print(f"  docker.io/{FULL_IMAGE_NAME}")